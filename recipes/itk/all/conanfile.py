@@ -1,10 +1,335 @@
+from conan.tools.microsoft import is_msvc
 from conans import ConanFile, CMake, tools
 from conans.errors import ConanInvalidConfiguration
-import glob
+import functools
+import hashlib
+import json
 import os
 import textwrap
-
-required_conan_version = ">=1.43.0"
+from types import MappingProxyType
+from typing import NamedTuple
+
+required_conan_version = ">=1.45.0"
+
+_ENABLED_MODULES = frozenset({
+    "ITKDCMTK",
+    "ITKIODCMTK",
+    "ITKIOHDF5",
+    "ITKAnisotropicSmoothing",
+    "ITKAntiAlias",
+    "ITKBiasCorrection",
+    "ITKBinaryMathematicalMorphology",
+    "ITKBioCell",
+    "ITKClassifiers",
+    "ITKColormap",
+    "ITKConnectedComponents",
+    "ITKConvolution",
+    "ITKCurvatureFlow",
+    "ITKDeconvolution",
+    "ITKDeformableMesh",
+    "ITKDenoising",
+    "ITKDiffusionTensorImage",
+    "ITKDisplacementField",
+    "ITKDistanceMap",
+    "ITKEigen",
+    "ITKFEM",
+    "ITKFEMRegistration",
+    "ITKFFT",
+    "ITKFastMarching",
+    "ITKGIFTI",
+    "ITKIOCSV",
+    "ITKIOGE",
+    "ITKIOIPL",
+    "ITKIOMesh",
+    "ITKIOPhilipsREC",
+    "ITKIORAW",
+    "ITKIOSiemens",
+    "ITKIOSpatialObjects",
+    "ITKIOTransformBase",
+    "ITKIOTransformInsightLegacy",
+    "ITKIOTransformMatlab",
+    "ITKIOXML",
+    "ITKImageCompare",
+    "ITKImageCompose",
+    "ITKImageFeature",
+    "ITKImageFusion",
+    "ITKImageGradient",
+    "ITKImageGrid",
+    "ITKImageIntensity",
+    "ITKImageLabel",
+    "ITKImageSources",
+    "ITKImageStatistics",
+    "ITKIntegratedTest",
+    "ITKKLMRegionGrowing",
+    "ITKLabelMap",
+    "ITKLabelVoting",
+    "ITKLevelSets",
+    "ITKLevelSetsv4",
+    "ITKMarkovRandomFieldsClassifiers",
+    "ITKMathematicalMorphology",
+    "ITKMetricsv4",
+    "ITKNarrowBand",
+    "ITKNeuralNetworks",
+    "ITKOptimizers",
+    "ITKOptimizersv4",
+    "ITKPDEDeformableRegistration",
+    "ITKPath",
+    "ITKPolynomials",
+    "ITKQuadEdgeMeshFiltering",
+    "ITKRegionGrowing",
+    "ITKRegistrationCommon",
+    "ITKRegistrationMethodsv4",
+    "ITKReview",
+    "ITKSignedDistanceFunction",
+    "ITKSmoothing",
+    "ITKSpatialFunction",
+    "ITKTBB",
+    "ITKThresholding",
+    "ITKVideoCore",
+    "ITKVideoFiltering",
+    "ITKVoronoi",
+    "ITKWatersheds",
+    "ITKDICOMParser",
+})
+
+# ITK modules which are never built: disabled at configure time and not
+# required by any enabled module
+_DISABLED_MODULES = frozenset({
+    "ITKDeprecated",
+    "ITKMINC",
+    "ITKIOMINC",
+    "ITKVideoBridgeOpenCV",
+    "ITKVideoIO",
+    "ITKVtkGlue",
+    # Disabled on Linux (link errors)
+    "ITKLevelSetsv4Visualization",
+    # Disabled because Vxl vidl is not built anymore
+    "ITKVideoBridgeVXL",
+    # OpenCL based, deprecated upstream. Nothing is compiled in these modules
+    # without ITK_USE_GPU, which requires OpenCL.
+    "ITKGPUAnisotropicSmoothing",
+    "ITKGPUImageFilterBase",
+    "ITKGPUPDEDeformableRegistration",
+    "ITKGPURegistrationCommon",
+    "ITKGPUSmoothing",
+    "ITKGPUThresholding",
+})
+
+_STATIC_CMAKE_DEFS = {
+    "BUILD_EXAMPLES": False,
+    "BUILD_TESTING": False,
+    "BUILD_DOCUMENTATION": False,
+    "ITK_SKIP_PATH_LENGTH_CHECKS": True,
+
+    "ITK_USE_SYSTEM_LIBRARIES": True,
+    "ITK_USE_SYSTEM_DCMTK": True,
+    "ITK_USE_SYSTEM_DOUBLECONVERSION": True,
+    "ITK_USE_SYSTEM_EIGEN": True,
+    "ITK_USE_SYSTEM_FFTW": True,
+    "ITK_USE_SYSTEM_GDCM": True,
+    "ITK_USE_SYSTEM_HDF5": True,
+    "ITK_USE_SYSTEM_ICU": True,
+    "ITK_USE_SYSTEM_JPEG": True,
+    "ITK_USE_SYSTEM_PNG": True,
+    "ITK_USE_SYSTEM_TIFF": True,
+    "ITK_USE_SYSTEM_ZLIB": True,
+
+    # FIXME: Missing Kwiml recipe
+    "ITK_USE_SYSTEM_KWIML": False,
+    # FIXME: Missing VXL recipe
+    "ITK_USE_SYSTEM_VXL": False,
+    "GDCM_USE_SYSTEM_OPENJPEG": True,
+
+    "ITK_BUILD_DEFAULT_MODULES": False,
+    **{f"Module_{module}": True for module in sorted(_ENABLED_MODULES)},
+    **{f"Module_{module}": False for module in sorted(_DISABLED_MODULES)},
+
+    # Disabled, but still built as dependencies of ITKReview
+    "Module_ITKIOTransformHDF5": False,
+    "Module_ITKVTK": False,
+}
+
+_ALIAS_TARGET_TEMPLATE = textwrap.dedent("""\
+    if(TARGET {aliased} AND NOT TARGET {alias})
+        add_library({alias} INTERFACE IMPORTED)
+        set_property(TARGET {alias} PROPERTY INTERFACE_LINK_LIBRARIES {aliased})
+    endif()
+""")
+
+
+# An ITK library, exposed as a cpp_info component
+class _Component(NamedTuple):
+    name: str
+    requires: tuple = ()
+    system_libs: tuple = () # only linked on Linux and FreeBSD
+    header_only: bool = False
+
+
+# Requirements shared by several components
+_STATISTICS_REQUIRES = ("ITKCommon", "ITKStatistics", "ITKTransform", "ITKSpatialObjects", "ITKPath")
+_MESH_IO_REQUIRES = ("ITKCommon", "ITKIOMeshBase")
+
+# Read-only mapping of component name to _Component.
+# Components are listed after their requirements, and stored in reverse order:
+# conan sorts components from most dependent to least dependent, and this order
+# lets it pick the next one on its first attempt.
+_ITK_COMPONENTS = MappingProxyType({component.name: component for component in reversed((
+    _Component("itksys"),
+    _Component("itkvcl", system_libs=("m",)),
+    _Component("itkv3p_netlib", system_libs=("m",)),
+    _Component("itkvnl", requires=("itkvcl",)),
+    _Component("itkvnl_algo", requires=("itkv3p_netlib", "itkvnl")),
+    _Component("itktestlib", requires=("itkvcl",)),
+    _Component(
+        "ITKVNLInstantiation",
+        requires=(
+            "itkvnl_algo", "itkvnl", "itkv3p_netlib", "itkvcl",
+        ),
+    ),
+    _Component(
+        "ITKCommon",
+        requires=(
+            "itksys", "ITKVNLInstantiation", "eigen::eigen",
+            "onetbb::onetbb", "double-conversion::double-conversion",
+        ),
+        system_libs=("m",),
+    ),
+    _Component("itkNetlibSlatec", requires=("itkv3p_netlib",)),
+    _Component("ITKStatistics", requires=("ITKCommon", "itkNetlibSlatec")),
+    _Component("ITKTransform", requires=("ITKCommon",)),
+    _Component("ITKMesh", requires=("ITKTransform",)),
+    _Component("ITKMetaIO", requires=("zlib::zlib",)),
+    _Component("ITKSpatialObjects", requires=("ITKTransform", "ITKCommon", "ITKMesh")),
+    _Component("ITKPath", requires=("ITKCommon",)),
+    _Component("ITKImageIntensity"),
+    _Component("ITKLabelMap", requires=_STATISTICS_REQUIRES),
+    _Component("ITKQuadEdgeMesh", requires=("ITKMesh",)),
+    _Component("ITKFastMarching"),
+    _Component("ITKIOImageBase", requires=("ITKCommon",)),
+    _Component("ITKSmoothing"),
+    _Component("ITKImageFeature", requires=("ITKSmoothing", "ITKSpatialObjects")),
+    _Component("ITKOptimizers", requires=("ITKStatistics",)),
+    _Component("ITKPolynomials", requires=("ITKCommon",)),
+    _Component("ITKBiasCorrection", requires=_STATISTICS_REQUIRES),
+    _Component("ITKColormap"),
+    _Component("ITKFFT", requires=("ITKCommon", "fftw::fftw")),
+    _Component("ITKConvolution", requires=("ITKFFT",) + _STATISTICS_REQUIRES),
+    _Component("ITKDICOMParser"),
+    _Component(
+        "ITKDeformableMesh",
+        requires=(
+            "ITKCommon", "ITKStatistics", "ITKTransform", "ITKImageFeature",
+            "ITKSpatialObjects", "ITKPath", "ITKMesh",
+        ),
+    ),
+    _Component("ITKDenoising"),
+    _Component("ITKDiffusionTensorImage"),
+    _Component("ITKIOXML", requires=("ITKIOImageBase", "expat::expat")),
+    _Component("ITKIOSpatialObjects", requires=("ITKSpatialObjects", "ITKIOXML", "ITKMesh")),
+    _Component(
+        "ITKFEM",
+        requires=_STATISTICS_REQUIRES + (
+            "ITKSmoothing", "ITKImageFeature", "ITKOptimizers", "ITKMetaIO",
+        ),
+    ),
+    _Component(
+        "ITKPDEDeformableRegistration",
+        requires=_STATISTICS_REQUIRES + (
+            "ITKSmoothing", "ITKImageFeature", "ITKOptimizers",
+        ),
+    ),
+    _Component(
+        "ITKFEMRegistration",
+        requires=(
+            "ITKFEM", "ITKImageFeature", "ITKCommon", "ITKSpatialObjects",
+            "ITKTransform", "ITKPDEDeformableRegistration",
+        ),
+    ),
+    _Component("ITKznz", requires=("zlib::zlib",)),
+    _Component("ITKniftiio", requires=("ITKznz",), system_libs=("m",)),
+    _Component("ITKgiftiio", requires=("ITKznz", "ITKniftiio", "expat::expat")),
+    _Component("ITKIOBMP", requires=("ITKIOImageBase",)),
+    _Component("ITKIOBioRad", requires=("ITKIOImageBase",)),
+    _Component("ITKIOCSV", requires=("ITKIOImageBase",)),
+    _Component("ITKIODCMTK", requires=("ITKIOImageBase", "dcmtk::dcmtk", "icu::icu")),
+    _Component("ITKIOGDCM", requires=("ITKCommon", "ITKIOImageBase", "gdcm::gdcmDICT", "gdcm::gdcmMSFF")),
+    _Component("ITKIOIPL", requires=("ITKIOImageBase",)),
+    _Component("ITKIOGE", requires=("ITKIOIPL", "ITKIOImageBase")),
+    _Component("ITKIOGIPL", requires=("ITKIOImageBase", "zlib::zlib")),
+    _Component("ITKIOHDF5", requires=("ITKIOImageBase", "hdf5::hdf5")),
+    _Component("ITKIOJPEG", requires=("ITKIOImageBase", "libjpeg::libjpeg")),
+    _Component(
+        "ITKIOMeshBase",
+        requires=(
+            "ITKCommon", "ITKIOImageBase", "ITKMesh", "ITKQuadEdgeMesh",
+        ),
+    ),
+    _Component("ITKIOMeshBYU", requires=_MESH_IO_REQUIRES),
+    _Component("ITKIOMeshFreeSurfer", requires=_MESH_IO_REQUIRES),
+    _Component("ITKIOMeshGifti", requires=_MESH_IO_REQUIRES + ("ITKgiftiio",)),
+    _Component("ITKIOMeshOBJ", requires=_MESH_IO_REQUIRES),
+    _Component("ITKIOMeshOFF", requires=_MESH_IO_REQUIRES),
+    _Component("ITKIOMeshVTK", requires=_MESH_IO_REQUIRES + ("double-conversion::double-conversion",)),
+    _Component("ITKIOMeta", requires=("ITKIOImageBase", "ITKMetaIO")),
+    _Component("ITKIONIFTI", requires=("ITKIOImageBase", "ITKznz", "ITKniftiio", "ITKTransform")),
+    _Component("ITKNrrdIO", requires=("zlib::zlib",)),
+    _Component("ITKIONRRD", requires=("ITKIOImageBase", "ITKNrrdIO")),
+    _Component("ITKIOPNG", requires=("ITKIOImageBase", "libpng::libpng")),
+    _Component("ITKIOPhilipsREC", requires=("zlib::zlib",)),
+    _Component("ITKIOSiemens", requires=("ITKIOImageBase", "ITKIOIPL")),
+    _Component("ITKIOStimulate", requires=("ITKIOImageBase",)),
+    _Component("ITKIOTIFF", requires=("ITKIOImageBase", "libtiff::libtiff")),
+    _Component("ITKTransformFactory", requires=("ITKCommon", "ITKTransform")),
+    _Component("ITKIOTransformBase", requires=("ITKCommon", "ITKTransform", "ITKTransformFactory")),
+    _Component("ITKIOTransformHDF5", requires=("ITKIOTransformBase", "hdf5::hdf5")),
+    _Component("ITKIOTransformInsightLegacy", requires=("ITKIOTransformBase", "double-conversion::double-conversion")),
+    _Component("ITKIOTransformMatlab", requires=("ITKIOTransformBase",)),
+    _Component("ITKIOVTK", requires=("ITKIOImageBase",)),
+    _Component("ITKKLMRegionGrowing", requires=("ITKCommon",)),
+    _Component("itklbfgs"),
+    _Component("ITKMarkovRandomFieldsClassifiers", requires=_STATISTICS_REQUIRES),
+    _Component("ITKOptimizersv4", requires=("ITKOptimizers", "itklbfgs")),
+    _Component("itkopenjpeg", header_only=True, requires=("openjpeg::openjpeg",)),
+    _Component("ITKQuadEdgeMeshFiltering", requires=("ITKMesh",)),
+    _Component("ITKRegionGrowing", requires=_STATISTICS_REQUIRES),
+    _Component(
+        "ITKRegistrationMethodsv4",
+        requires=(
+            "ITKCommon", "ITKOptimizersv4", "ITKStatistics", "ITKTransform",
+            "ITKSpatialObjects", "ITKPath", "ITKSmoothing", "ITKImageFeature",
+            "ITKOptimizers",
+        ),
+    ),
+    _Component("ITKVTK", requires=("ITKCommon",)),
+    _Component("ITKWatersheds", requires=_STATISTICS_REQUIRES + ("ITKSmoothing",)),
+    _Component(
+        "ITKReview",
+        requires=(
+            "ITKCommon", "ITKStatistics", "ITKTransform", "ITKLabelMap",
+            "ITKSpatialObjects", "ITKPath", "ITKFastMarching", "ITKIOImageBase",
+            "ITKImageFeature", "ITKOptimizers", "ITKBiasCorrection",
+            "ITKDeformableMesh", "ITKDiffusionTensorImage", "ITKSmoothing",
+            "ITKFFT", "ITKIOBMP", "ITKIOBioRad", "ITKIOGDCM", "ITKIOGE",
+            "ITKIOGIPL", "ITKIOIPL", "ITKIOJPEG", "ITKIOMeta", "ITKIONIFTI",
+            "ITKIONRRD", "ITKIOPNG", "ITKIOSiemens", "ITKIOStimulate", "ITKIOTIFF",
+            "ITKIOTransformHDF5", "ITKIOTransformInsightLegacy",
+            "ITKIOTransformMatlab", "ITKIOVTK", "ITKIOXML", "ITKKLMRegionGrowing",
+            "ITKMarkovRandomFieldsClassifiers", "ITKMesh", "ITKPDEDeformableRegistration",
+            "ITKPolynomials", "ITKQuadEdgeMesh", "ITKQuadEdgeMeshFiltering",
+            "ITKRegionGrowing", "ITKVTK", "ITKWatersheds", "itkopenjpeg",
+        ),
+    ),
+    _Component(
+        "ITKTestKernel",
+        requires=(
+            "ITKCommon", "ITKIOImageBase", "ITKIOBMP", "ITKIOGDCM", "ITKIOGIPL",
+            "ITKIOJPEG", "ITKIOMeshBYU", "ITKIOMeshFreeSurfer", "ITKIOMeshGifti",
+            "ITKIOMeshOBJ", "ITKIOMeshOFF", "ITKIOMeshVTK", "ITKIOMeta", "ITKIONIFTI",
+            "ITKIONRRD", "ITKIOPNG", "ITKIOTIFF", "ITKIOVTK",
+        ),
+    ),
+    _Component("ITKVideoCore", requires=("ITKCommon",)),
+)) if component.name not in _DISABLED_MODULES})
 
 
 class ITKConan(ConanFile):
@@ -19,15 +344,20 @@ class ITKConan(ConanFile):
     options = {
         "shared": [True, False],
         "fPIC": [True, False],
+        "with_compiler_cache": [True, False],
+        "cmake_unity_build": [True, False],
+        "lto": [True, False],
     }
     default_options = {
         "shared": False,
         "fPIC": True,
+        "with_compiler_cache": False,
+        "cmake_unity_build": False,
+        "lto": False,
     }
 
     short_paths = True
     generators = "cmake", "cmake_find_package"
-    _cmake = None
 
     @property
     def _source_subfolder(self):
@@ -44,8 +374,7 @@ class ITKConan(ConanFile):
 
     def export_sources(self):
         self.copy("CMakeLists.txt")
-        for patch in self.conan_data.get("patches", {}).get(self.version, []):
-            self.copy(patch["patch_file"])
+        self.copy("*.patch", src="patches", dst="patches")
 
     def config_options(self):
         if self.settings.os == "Windows":
@@ -55,6 +384,14 @@ class ITKConan(ConanFile):
         if self.options.shared:
             del self.options.fPIC
 
+    def package_id(self):
+        # The compiler cache only speeds up rebuilds, except with MSVC where debug
+        # info is then embedded in objects and static libraries instead of PDB files
+        if not (is_msvc(self) and self.settings.build_type in ["Debug", "RelWithDebInfo"]):
+            del self.info.options.with_compiler_cache
+        if self.settings.build_type != "Release":
+            del self.info.options.lto # Only applied to Release builds
+
     def requirements(self):
         self.requires("dcmtk/3.6.6")
         self.requires("double-conversion/3.2.0")
@@ -105,143 +442,78 @@ class ITKConan(ConanFile):
                   destination=self._source_subfolder, strip_root=True)
 
     def _patch_sources(self):
-        for patch in self.conan_data.get("patches", {}).get(self.version, []):
+        patches = self.conan_data.get("patches", {}).get(self.version, [])
+        # Patches are not idempotent: do not apply them again on an already patched build folder
+        patches_hash = hashlib.sha256(json.dumps(patches, sort_keys=True).encode())
+        for patch in patches:
+            if "patch_file" in patch:
+                # Same path as tools.patch() below, relative to the working directory
+                with open(patch["patch_file"], "rb") as patch_file:
+                    patches_hash.update(patch_file.read())
+        sentinel = os.path.join(self._source_subfolder, f".patched.{patches_hash.hexdigest()}")
+        if os.path.isfile(sentinel):
+            return
+        for patch in patches:
             tools.patch(**patch)
+        tools.save(sentinel, "")
 
     def _configure_cmake(self):
-        if self._cmake:
-            return self._cmake
-
-        self._cmake = CMake(self)
-        self._cmake.definitions["BUILD_EXAMPLES"] = False
-        self._cmake.definitions["BUILD_TESTING"] = False
-        self._cmake.definitions["BUILD_DOCUMENTATION"] = False
-        self._cmake.definitions["ITK_SKIP_PATH_LENGTH_CHECKS"] = True
-
-        self._cmake.definitions["ITK_USE_SYSTEM_LIBRARIES"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_DCMTK"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_DOUBLECONVERSION"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_EIGEN"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_FFTW"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_GDCM"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_HDF5"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_ICU"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_JPEG"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_PNG"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_TIFF"] = True
-        self._cmake.definitions["ITK_USE_SYSTEM_ZLIB"] = True
-
-        # FIXME: Missing Kwiml recipe
-        self._cmake.definitions["ITK_USE_SYSTEM_KWIML"] = False
-        # FIXME: Missing VXL recipe
-        self._cmake.definitions["ITK_USE_SYSTEM_VXL"] = False
-        self._cmake.definitions["GDCM_USE_SYSTEM_OPENJPEG"] = True
-
-        self._cmake.definitions["ITK_BUILD_DEFAULT_MODULES"] = False
-        self._cmake.definitions["Module_ITKDeprecated"] = False
-        self._cmake.definitions["Module_ITKMINC"] = False
-        self._cmake.definitions["Module_ITKIOMINC"] = False
-
-        self._cmake.definitions["Module_ITKVideoBridgeOpenCV"] = False
-
-        self._cmake.definitions["Module_ITKDCMTK"] = True
-        self._cmake.definitions["Module_ITKIODCMTK"] = True
-        self._cmake.definitions["Module_ITKIOHDF5"] = True
-        self._cmake.definitions["Module_ITKIOTransformHDF5"] = False
-        self._cmake.definitions["Module_ITKAnisotropicSmoothing"] = True
-        self._cmake.definitions["Module_ITKAntiAlias"] = True
-        self._cmake.definitions["Module_ITKBiasCorrection"] = True
-        self._cmake.definitions["Module_ITKBinaryMathematicalMorphology"] = True
-        self._cmake.definitions["Module_ITKBioCell"] = True
-        self._cmake.definitions["Module_ITKClassifiers"] = True
-        self._cmake.definitions["Module_ITKColormap"] = True
-        self._cmake.definitions["Module_ITKConnectedComponents"] = True
-        self._cmake.definitions["Module_ITKConvolution"] = True
-        self._cmake.definitions["Module_ITKCurvatureFlow"] = True
-        self._cmake.definitions["Module_ITKDeconvolution"] = True
-        self._cmake.definitions["Module_ITKDeformableMesh"] = True
-        self._cmake.definitions["Module_ITKDenoising"] = True
-        self._cmake.definitions["Module_ITKDiffusionTensorImage"] = True
-        self._cmake.definitions["Module_ITKDisplacementField"] = True
-        self._cmake.definitions["Module_ITKDistanceMap"] = True
-        self._cmake.definitions["Module_ITKEigen"] = True
-        self._cmake.definitions["Module_ITKFEM"] = True
-        self._cmake.definitions["Module_ITKFEMRegistration"] = True
-        self._cmake.definitions["Module_ITKFFT"] = True
-        self._cmake.definitions["Module_ITKFastMarching"] = True
-        self._cmake.definitions["Module_ITKGIFTI"] = True
-        self._cmake.definitions["Module_ITKGPUAnisotropicSmoothing"] = True
-        self._cmake.definitions["Module_ITKGPUImageFilterBase"] = True
-        self._cmake.definitions["Module_ITKGPUPDEDeformableRegistration"] = True
-        self._cmake.definitions["Module_ITKGPURegistrationCommon"] = True
-        self._cmake.definitions["Module_ITKGPUSmoothing"] = True
-        self._cmake.definitions["Module_ITKGPUThresholding"] = True
-        self._cmake.definitions["Module_ITKIOCSV"] = True
-        self._cmake.definitions["Module_ITKIOGE"] = True
-        self._cmake.definitions["Module_ITKIOIPL"] = True
-        self._cmake.definitions["Module_ITKIOMesh"] = True
-        self._cmake.definitions["Module_ITKIOPhilipsREC"] = True
-        self._cmake.definitions["Module_ITKIORAW"] = True
-        self._cmake.definitions["Module_ITKIOSiemens"] = True
-        self._cmake.definitions["Module_ITKIOSpatialObjects"] = True
-        self._cmake.definitions["Module_ITKIOTransformBase"] = True
-        self._cmake.definitions["Module_ITKIOTransformInsightLegacy"] = True
-        self._cmake.definitions["Module_ITKIOTransformMatlab"] = True
-        self._cmake.definitions["Module_ITKIOXML"] = True
-        self._cmake.definitions["Module_ITKImageCompare"] = True
-        self._cmake.definitions["Module_ITKImageCompose"] = True
-        self._cmake.definitions["Module_ITKImageFeature"] = True
-        self._cmake.definitions["Module_ITKImageFusion"] = True
-        self._cmake.definitions["Module_ITKImageGradient"] = True
-        self._cmake.definitions["Module_ITKImageGrid"] = True
-        self._cmake.definitions["Module_ITKImageIntensity"] = True
-        self._cmake.definitions["Module_ITKImageLabel"] = True
-        self._cmake.definitions["Module_ITKImageSources"] = True
-        self._cmake.definitions["Module_ITKImageStatistics"] = True
-        self._cmake.definitions["Module_ITKIntegratedTest"] = True
-        self._cmake.definitions["Module_ITKKLMRegionGrowing"] = True
-        self._cmake.definitions["Module_ITKLabelMap"] = True
-        self._cmake.definitions["Module_ITKLabelVoting"] = True
-        self._cmake.definitions["Module_ITKLevelSets"] = True
-        self._cmake.definitions["Module_ITKLevelSetsv4"] = True
-        self._cmake.definitions["Module_ITKMarkovRandomFieldsClassifiers"] = True
-        self._cmake.definitions["Module_ITKMathematicalMorphology"] = True
-        self._cmake.definitions["Module_ITKMetricsv4"] = True
-        self._cmake.definitions["Module_ITKNarrowBand"] = True
-        self._cmake.definitions["Module_ITKNeuralNetworks"] = True
-        self._cmake.definitions["Module_ITKOptimizers"] = True
-        self._cmake.definitions["Module_ITKOptimizersv4"] = True
-        self._cmake.definitions["Module_ITKPDEDeformableRegistration"] = True
-        self._cmake.definitions["Module_ITKPath"] = True
-        self._cmake.definitions["Module_ITKPolynomials"] = True
-        self._cmake.definitions["Module_ITKQuadEdgeMeshFiltering"] = True
-        self._cmake.definitions["Module_ITKRegionGrowing"] = True
-        self._cmake.definitions["Module_ITKRegistrationCommon"] = True
-        self._cmake.definitions["Module_ITKRegistrationMethodsv4"] = True
-        self._cmake.definitions["Module_ITKReview"] = True
-        self._cmake.definitions["Module_ITKSignedDistanceFunction"] = True
-        self._cmake.definitions["Module_ITKSmoothing"] = True
-        self._cmake.definitions["Module_ITKSpatialFunction"] = True
-        self._cmake.definitions["Module_ITKTBB"] = True
-        self._cmake.definitions["Module_ITKThresholding"] = True
-        self._cmake.definitions["Module_ITKVideoCore"] = True
-        self._cmake.definitions["Module_ITKVideoFiltering"] = True
-        self._cmake.definitions["Module_ITKVideoIO"] = False
-        self._cmake.definitions["Module_ITKVoronoi"] = True
-        self._cmake.definitions["Module_ITKWatersheds"] = True
-        self._cmake.definitions["Module_ITKDICOMParser"] = True
-
-        self._cmake.definitions["Module_ITKVTK"] = False
-        self._cmake.definitions["Module_ITKVtkGlue"] = False
-
-        # Disabled on Linux (link errors)
-        self._cmake.definitions["Module_ITKLevelSetsv4Visualization"] = False
-
-        # Disabled because Vxl vidl is not built anymore
-        self._cmake.definitions["Module_ITKVideoBridgeVXL"] = False
-
-        self._cmake.configure(build_folder=self._build_subfolder)
-        return self._cmake
+        options_key = tuple(sorted((name, str(value)) for name, value in self.options.items()))
+        return self._configure_cmake_for_options(options_key)
+
+    @functools.lru_cache(4)
+    def _configure_cmake_for_options(self, options_key): # pylint: disable=unused-argument
+        # options_key is only there to get a different CMake object if options change
+        cmake = CMake(self)
+        cmake.definitions.update(_STATIC_CMAKE_DEFS)
+
+        if self.options.with_compiler_cache:
+            launcher = tools.which("sccache") or tools.which("ccache")
+            if not launcher:
+                self.output.warn("with_compiler_cache is enabled but neither sccache nor ccache was found in PATH")
+            elif not any(generator in (cmake.generator or "") for generator in ["Ninja", "Makefiles"]):
+                # CMAKE_<LANG>_COMPILER_LAUNCHER is ignored by other generators (e.g. Visual Studio)
+                self.output.warn(f"with_compiler_cache is enabled but the {cmake.generator} CMake generator does not "
+                                 "support compiler launchers, use Ninja or Makefiles")
+            else:
+                cmake.definitions["CMAKE_C_COMPILER_LAUNCHER"] = launcher
+                cmake.definitions["CMAKE_CXX_COMPILER_LAUNCHER"] = launcher
+                if is_msvc(self):
+                    # Debug info written to a shared PDB (/Zi) defeats caching, embed it in objects (/Z7)
+                    cmake.definitions["CMAKE_POLICY_DEFAULT_CMP0141"] = "NEW"
+                    cmake.definitions["CMAKE_MSVC_DEBUG_INFORMATION_FORMAT"] = "Embedded"
+
+        if self.options.cmake_unity_build:
+            # Requires CMake >= 3.16, ignored by older versions
+            cmake.definitions["CMAKE_UNITY_BUILD"] = True
+            cmake.definitions["CMAKE_UNITY_BUILD_MODE"] = "BATCH"
+            cmake.definitions["CMAKE_UNITY_BUILD_BATCH_SIZE"] = 16
+
+        if self.options.lto and self.settings.build_type == "Release":
+            # CMake already selects ThinLTO (-flto=thin) for clang
+            cmake.definitions["CMAKE_POLICY_DEFAULT_CMP0069"] = "NEW"
+            cmake.definitions["CMAKE_INTERPROCEDURAL_OPTIMIZATION"] = True
+
+        self._cmake_configure_cached(cmake, self._build_subfolder)
+        return cmake
+
+    def _cmake_configure_cached(self, cmake, build_subfolder):
+        # build() and package() may run in different processes: do not pay for
+        # a full CMake configure again if this build folder was already
+        # configured with exactly the same command line (generator, toolset,
+        # platform and definitions)
+        build_dir = os.path.join(self.build_folder, build_subfolder)
+        configure_hash_file = os.path.join(build_dir, ".conan_cmake_configure.sha")
+        configure_hash = hashlib.sha256(cmake.command_line.encode()).hexdigest()
+        if os.path.isfile(os.path.join(build_dir, "CMakeCache.txt")) and \
+           os.path.isfile(configure_hash_file) and tools.load(configure_hash_file) == configure_hash:
+            cmake.build_folder = build_dir
+            return
+        cmake.configure(build_folder=build_subfolder)
+        # configure() is a no-op when configuring is disabled (e.g. conan build --build):
+        # the existing CMakeCache.txt does not match this command line then
+        if self.should_configure:
+            tools.save(configure_hash_file, configure_hash)
 
     def build(self):
         self._patch_sources()
@@ -255,253 +527,76 @@ class ITKConan(ConanFile):
         tools.rmdir(os.path.join(self.package_folder, "lib", "pkgconfig"))
         tools.rmdir(os.path.join(self.package_folder, "share"))
         tools.rmdir(os.path.join(self.package_folder, self._cmake_module_dir, "Modules"))
-        # Do not remove UseITK.cmake and *.h.in files
-        for cmake_file in glob.glob(os.path.join(self.package_folder, self._cmake_module_dir, "*.cmake")):
-            if os.path.basename(cmake_file) != "UseITK.cmake":
-                os.remove(cmake_file)
+        # Do not remove UseITK.cmake (and what it includes) and *.h.in files
+        keep = {"UseITK.cmake", "ITKInitializeCXXStandard.cmake"}
+        with os.scandir(os.path.join(self.package_folder, self._cmake_module_dir)) as entries:
+            for entry in entries:
+                if entry.name.endswith(".cmake") and entry.name not in keep:
+                    os.remove(entry.path)
 
         self._create_cmake_module_alias_targets(
             os.path.join(self.package_folder, self._module_file_rel_path),
-            {target:"ITK::{}".format(target) for target in self._itk_components.keys()},
+            {name: f"ITK::{name}" for name in _ITK_COMPONENTS},
         )
 
     @staticmethod
     def _create_cmake_module_alias_targets(module_file, targets):
-        content = ""
-        for alias, aliased in targets.items():
-            content += textwrap.dedent("""\
-                if(TARGET {aliased} AND NOT TARGET {alias})
-                    add_library({alias} INTERFACE IMPORTED)
-                    set_property(TARGET {alias} PROPERTY INTERFACE_LINK_LIBRARIES {aliased})
-                endif()
-            """.format(alias=alias, aliased=aliased))
+        content = "".join(_ALIAS_TARGET_TEMPLATE.format(alias=alias, aliased=aliased)
+                          for alias, aliased in targets.items())
         tools.save(module_file, content)
 
     @property
+    @functools.lru_cache(1)
     def _module_file_rel_path(self):
         return os.path.join(self._cmake_module_dir, "conan-official-{}-targets.cmake".format(self.name))
 
     @property
+    @functools.lru_cache(1)
     def _cmake_module_dir(self):
         return os.path.join("lib", "cmake", self._itk_subdir)
 
     @property
-    def _itk_subdir(self):
-        v = tools.Version(self.version)
-        return "ITK-{}.{}".format(v.major, v.minor)
+    @functools.lru_cache(1)
+    def _itk_version(self):
+        return tools.Version(self.version)
 
     @property
-    def _itk_components(self):
-        def libm():
-            return ["m"] if self.settings.os in ["Linux", "FreeBSD"] else []
-
-        return {
-            "itksys": {},
-            "itkvcl": {"system_libs": libm()},
-            "itkv3p_netlib": {"system_libs": libm()},
-            "itkvnl": {"requires": ["itkvcl"]},
-            "itkvnl_algo": {"requires": ["itkv3p_netlib", "itkvnl"]},
-            "itktestlib": {"requires": ["itkvcl"]},
-            "ITKVNLInstantiation": {
-                "requires": [
-                    "itkvnl_algo", "itkvnl", "itkv3p_netlib", "itkvcl",
-                ],
-            },
-            "ITKCommon": {
-                "requires": [
-                    "itksys", "ITKVNLInstantiation", "eigen::eigen",
-                    "onetbb::onetbb", "double-conversion::double-conversion",
-                ],
-                "system_libs": libm(),
-            },
-            "itkNetlibSlatec": {"requires": ["itkv3p_netlib"]},
-            "ITKStatistics": {"requires": ["ITKCommon", "itkNetlibSlatec"]},
-            "ITKTransform": {"requires": ["ITKCommon"]},
-            "ITKMesh": {"requires": ["ITKTransform"]},
-            "ITKMetaIO": {"requires": ["zlib::zlib"]},
-            "ITKSpatialObjects": {"requires": ["ITKTransform", "ITKCommon", "ITKMesh"]},
-            "ITKPath": {"requires": ["ITKCommon"]},
-            "ITKImageIntensity": {},
-            "ITKLabelMap": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath",
-                ],
-            },
-            "ITKQuadEdgeMesh": {"requires": ["ITKMesh"]},
-            "ITKFastMarching": {},
-            "ITKIOImageBase": {"requires": ["ITKCommon"]},
-            "ITKSmoothing": {},
-            "ITKImageFeature": {"requires": ["ITKSmoothing", "ITKSpatialObjects"]},
-            "ITKOptimizers": {"requires": ["ITKStatistics"]},
-            "ITKPolynomials": {"requires": ["ITKCommon"]},
-            "ITKBiasCorrection": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath",
-                ],
-            },
-            "ITKColormap": {},
-            "ITKFFT": {"requires": ["ITKCommon", "fftw::fftw"]},
-            "ITKConvolution": {
-                "requires": [
-                    "ITKFFT", "ITKCommon", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath",
-                ],
-            },
-            "ITKDICOMParser": {},
-            "ITKDeformableMesh": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform", "ITKImageFeature",
-                    "ITKSpatialObjects", "ITKPath", "ITKMesh",
-                ],
-            },
-            "ITKDenoising": {},
-            "ITKDiffusionTensorImage": {},
-            "ITKIOXML": {"requires": ["ITKIOImageBase", "expat::expat"]},
-            "ITKIOSpatialObjects": {"requires": ["ITKSpatialObjects", "ITKIOXML", "ITKMesh"]},
-            "ITKFEM": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath",
-                    "ITKSmoothing", "ITKImageFeature", "ITKOptimizers", "ITKMetaIO",
-                ],
-            },
-            "ITKPDEDeformableRegistration": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath", "ITKSmoothing",
-                    "ITKImageFeature", "ITKOptimizers",
-                ],
-            },
-            "ITKFEMRegistration": {
-                "requires": [
-                    "ITKFEM", "ITKImageFeature", "ITKCommon", "ITKSpatialObjects",
-                    "ITKTransform", "ITKPDEDeformableRegistration",
-                ],
-            },
-            "ITKznz": {"requires": ["zlib::zlib"]},
-            "ITKniftiio": {"requires": ["ITKznz"], "system_libs": libm()},
-            "ITKgiftiio": {"requires": ["ITKznz", "ITKniftiio", "expat::expat"]},
-            "ITKIOBMP": {"requires": ["ITKIOImageBase"]},
-            "ITKIOBioRad": {"requires": ["ITKIOImageBase"]},
-            "ITKIOCSV": {"requires": ["ITKIOImageBase"]},
-            "ITKIODCMTK": {"requires": ["ITKIOImageBase", "dcmtk::dcmtk", "icu::icu"]},
-            "ITKIOGDCM": {"requires": ["ITKCommon", "ITKIOImageBase", "gdcm::gdcmDICT", "gdcm::gdcmMSFF"]},
-            "ITKIOIPL": {"requires": ["ITKIOImageBase"]},
-            "ITKIOGE": {"requires": ["ITKIOIPL", "ITKIOImageBase"]},
-            "ITKIOGIPL": {"requires": ["ITKIOImageBase", "zlib::zlib"]},
-            "ITKIOHDF5": {"requires": ["ITKIOImageBase", "hdf5::hdf5"]},
-            "ITKIOJPEG": {"requires": ["ITKIOImageBase", "libjpeg::libjpeg"]},
-            "ITKIOMeshBase": {
-                "requires": [
-                    "ITKCommon", "ITKIOImageBase", "ITKMesh", "ITKQuadEdgeMesh",
-                ],
-            },
-            "ITKIOMeshBYU": {"requires": ["ITKCommon", "ITKIOMeshBase"]},
-            "ITKIOMeshFreeSurfer": {"requires": ["ITKCommon", "ITKIOMeshBase"]},
-            "ITKIOMeshGifti": {"requires": ["ITKCommon", "ITKIOMeshBase", "ITKgiftiio"]},
-            "ITKIOMeshOBJ": {"requires": ["ITKCommon", "ITKIOMeshBase"]},
-            "ITKIOMeshOFF": {"requires": ["ITKCommon", "ITKIOMeshBase"]},
-            "ITKIOMeshVTK": {"requires": ["ITKCommon", "ITKIOMeshBase", "double-conversion::double-conversion"]},
-            "ITKIOMeta": {"requires": ["ITKIOImageBase", "ITKMetaIO"]},
-            "ITKIONIFTI": {"requires": ["ITKIOImageBase", "ITKznz", "ITKniftiio", "ITKTransform"]},
-            "ITKNrrdIO": {"requires": ["zlib::zlib"]},
-            "ITKIONRRD": {"requires": ["ITKIOImageBase", "ITKNrrdIO"]},
-            "ITKIOPNG": {"requires": ["ITKIOImageBase", "libpng::libpng"]},
-            "ITKIOPhilipsREC": {"requires": ["zlib::zlib"]},
-            "ITKIOSiemens": {"requires": ["ITKIOImageBase", "ITKIOIPL"]},
-            "ITKIOStimulate": {"requires": ["ITKIOImageBase"]},
-            "ITKIOTIFF": {"requires": ["ITKIOImageBase", "libtiff::libtiff"]},
-            "ITKTransformFactory": {"requires": ["ITKCommon", "ITKTransform"]},
-            "ITKIOTransformBase": {"requires": ["ITKCommon", "ITKTransform", "ITKTransformFactory"]},
-            "ITKIOTransformHDF5": {"requires": ["ITKIOTransformBase", "hdf5::hdf5"]},
-            "ITKIOTransformInsightLegacy": {"requires": ["ITKIOTransformBase", "double-conversion::double-conversion"]},
-            "ITKIOTransformMatlab": {"requires": ["ITKIOTransformBase"]},
-            "ITKIOVTK": {"requires": ["ITKIOImageBase"]},
-            "ITKKLMRegionGrowing": {"requires": ["ITKCommon"]},
-            "itklbfgs": {},
-            "ITKMarkovRandomFieldsClassifiers": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath",
-                ],
-            },
-            "ITKOptimizersv4": {"requires": ["ITKOptimizers", "itklbfgs"]},
-            "itkopenjpeg": {"header_only": True, "requires": ["openjpeg::openjpeg"]},
-            "ITKQuadEdgeMeshFiltering": {"requires": ["ITKMesh"]},
-            "ITKRegionGrowing": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath",
-                ],
-            },
-            "ITKRegistrationMethodsv4": {
-                "requires": [
-                    "ITKCommon", "ITKOptimizersv4", "ITKStatistics", "ITKTransform",
-                    "ITKSpatialObjects", "ITKPath", "ITKSmoothing", "ITKImageFeature",
-                    "ITKOptimizers",
-                ],
-            },
-            "ITKVTK": {"requires": ["ITKCommon"]},
-            "ITKWatersheds": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform", "ITKSpatialObjects",
-                    "ITKPath", "ITKSmoothing",
-                ],
-            },
-            "ITKReview": {
-                "requires": [
-                    "ITKCommon", "ITKStatistics", "ITKTransform", "ITKLabelMap",
-                    "ITKSpatialObjects", "ITKPath", "ITKFastMarching", "ITKIOImageBase",
-                    "ITKImageFeature", "ITKOptimizers", "ITKBiasCorrection",
-                    "ITKDeformableMesh", "ITKDiffusionTensorImage", "ITKSmoothing",
-                    "ITKFFT", "ITKIOBMP", "ITKIOBioRad", "ITKIOGDCM", "ITKIOGE",
-                    "ITKIOGIPL", "ITKIOIPL", "ITKIOJPEG", "ITKIOMeta", "ITKIONIFTI",
-                    "ITKIONRRD", "ITKIOPNG", "ITKIOSiemens", "ITKIOStimulate", "ITKIOTIFF",
-                    "ITKIOTransformHDF5", "ITKIOTransformInsightLegacy",
-                    "ITKIOTransformMatlab", "ITKIOVTK", "ITKIOXML", "ITKKLMRegionGrowing",
-                    "ITKMarkovRandomFieldsClassifiers", "ITKMesh", "ITKPDEDeformableRegistration",
-                    "ITKPolynomials", "ITKQuadEdgeMesh", "ITKQuadEdgeMeshFiltering",
-                    "ITKRegionGrowing", "ITKVTK", "ITKWatersheds", "itkopenjpeg",
-                ],
-            },
-            "ITKTestKernel": {
-                "requires": [
-                    "ITKCommon", "ITKIOImageBase", "ITKIOBMP", "ITKIOGDCM", "ITKIOGIPL",
-                    "ITKIOJPEG", "ITKIOMeshBYU", "ITKIOMeshFreeSurfer", "ITKIOMeshGifti",
-                    "ITKIOMeshOBJ", "ITKIOMeshOFF", "ITKIOMeshVTK", "ITKIOMeta", "ITKIONIFTI",
-                    "ITKIONRRD", "ITKIOPNG", "ITKIOTIFF", "ITKIOVTK",
-                ],
-            },
-            "ITKVideoCore": {"requires": ["ITKCommon"]},
-        }
+    @functools.lru_cache(1)
+    def _itk_subdir(self):
+        return f"ITK-{self._itk_version.major}.{self._itk_version.minor}"
 
     def package_info(self):
         self.cpp_info.set_property("cmake_file_name", "ITK")
-        self.cpp_info.set_property("cmake_build_modules", [os.path.join(self._cmake_module_dir, "UseITK.cmake")])
-
-        itk_version = tools.Version(self.version)
-        lib_suffix = "-{}.{}".format(itk_version.major, itk_version.minor)
-
-        for name, values in self._itk_components.items():
-            is_header_only = values.get("header_only", False)
-            system_libs = values.get("system_libs", [])
-            requires = values.get("requires", [])
-            self.cpp_info.components[name].set_property("cmake_target_name", name)
-            self.cpp_info.components[name].builddirs.append(self._cmake_module_dir)
-            self.cpp_info.components[name].includedirs.append(os.path.join("include", self._itk_subdir))
-            if not is_header_only:
-                self.cpp_info.components[name].libs = ["{}{}".format(name, lib_suffix)]
-            self.cpp_info.components[name].system_libs = system_libs
-            self.cpp_info.components[name].requires = requires
+        use_itk_module = os.path.join(self._cmake_module_dir, "UseITK.cmake")
+        self.cpp_info.set_property("cmake_build_modules", [use_itk_module])
+
+        lib_suffix = f"-{self._itk_version.major}.{self._itk_version.minor}"
+
+        with_system_libs = self.settings.os in ["Linux", "FreeBSD"]
+        itk_include_dir = os.path.join("include", self._itk_subdir)
+
+        # TODO: to remove in conan v2 once cmake_find_package* generators removed
+        # Same for every component, so share a single dict
+        build_modules = {
+            "cmake": [use_itk_module],
+            "cmake_multi": [use_itk_module],
+            "cmake_find_package": [use_itk_module, self._module_file_rel_path],
+            "cmake_find_package_multi": [use_itk_module, self._module_file_rel_path],
+        }
+
+        for name, component in _ITK_COMPONENTS.items():
+            comp = self.cpp_info.components[name]
+            comp.set_property("cmake_target_name", name)
+            comp.builddirs = ["", self._cmake_module_dir]
+            comp.includedirs = ["include", itk_include_dir]
+            if not component.header_only:
+                comp.libs = [f"{name}{lib_suffix}"]
+            comp.system_libs = list(component.system_libs) if with_system_libs else []
+            comp.requires = list(component.requires)
 
             # TODO: to remove in conan v2 once cmake_find_package* generators removed
-            self.cpp_info.components[name].names["cmake_find_package"] = name
-            self.cpp_info.components[name].names["cmake_find_package_multi"] = name
-            self.cpp_info.components[name].build_modules.append(os.path.join(self._cmake_module_dir, "UseITK.cmake"))
-            self.cpp_info.components[name].build_modules["cmake_find_package"].append(self._module_file_rel_path)
-            self.cpp_info.components[name].build_modules["cmake_find_package_multi"].append(self._module_file_rel_path)
+            comp.names = {"cmake_find_package": name, "cmake_find_package_multi": name}
+            comp.build_modules = build_modules
 
         # TODO: to remove in conan v2 once cmake_find_package* generators removed
         self.cpp_info.names["cmake_find_package"] = "ITK"